@@ -26,10 +26,13 @@ class LooperPanel(bpy.types.Panel):
 
         layout.operator("object.loop_animation_operator")
         layout.operator("object.stitch_animations_operator")
+        layout.operator("object.find_transition_operator")
         layout.operator("object.remove_root_motion_operator")
         layout.operator("object.snap_keys_to_frames_operator")
         layout.operator("object.center_animation_operator")
         layout.operator("object.change_root_bone_operator")
+        layout.operator("object.loop_quality_report_operator")
+        layout.operator("object.export_looped_clips_operator")
         layout.separator()
         layout.operator("object.play_animation", text="Play Animation", icon="PLAY")
 
@@ -44,6 +47,10 @@ def register():
     bpy.utils.register_class(CenterAnimationOperator)
     bpy.utils.register_class(ChangeRootBoneOperator)
     bpy.utils.register_class(PlayAnimationOperator)
+    bpy.utils.register_class(LoopQualityReportOperator)
+    bpy.utils.register_class(ExportLoopedClipsOperator)
+    bpy.utils.register_class(FindTransitionOperator)
+    bpy.app.handlers.depsgraph_update_post.append(mark_changed_actions)
 
 def unregister():
     bpy.utils.unregister_class(LoopAnimationOperator)
@@ -54,6 +61,10 @@ def unregister():
     bpy.utils.unregister_class(CenterAnimationOperator)
     bpy.utils.unregister_class(ChangeRootBoneOperator)
     bpy.utils.unregister_class(PlayAnimationOperator)
+    bpy.utils.unregister_class(LoopQualityReportOperator)
+    bpy.utils.unregister_class(ExportLoopedClipsOperator)
+    bpy.utils.unregister_class(FindTransitionOperator)
+    bpy.app.handlers.depsgraph_update_post.remove(mark_changed_actions)
 
 #not sure this is needed here
 if __name__ == "__main__":
@@ -1,6 +1,14 @@
 import bpy
 from mathutils import Vector, Quaternion
+import numpy as np
 import copy
+import csv
+import json
+import os
+from .motion.quaternions import *
+from .motion.seam import *
+from .motion.clip_format import *
+from .motion.transitions import *
 
 # ==================== Operators ====================
 
@@ -110,6 +118,8 @@ class RemoveRootMotionOperator(bpy.types.Operator):
                     for keyframe in fcurve.keyframe_points:
                         keyframe.co[1] = 0
         
+        mark_action_changed(action)
+
         if self.x:
             self.report({'INFO'}, "Root motion removed on x-axis")
         if self.y:
@@ -266,8 +276,10 @@ class StitchAnimationsOperator(bpy.types.Operator):
 
         # Write stitched animations
         write_to_animation(obj, stitched_bone_positions_2, stitched_bone_rotations_2, num_frames_2, self.root_enum, self.stitch_root_x, self.stitch_root_y, self.stitch_root_z)
+        clear_loop_state(action_2)
         obj.animation_data.action = bpy.data.actions.get(self.start_enum)
         write_to_animation(obj, stitched_bone_positions_1, stitched_bone_rotations_1, num_frames_1, self.root_enum, self.stitch_root_x, self.stitch_root_y, self.stitch_root_z)
+        clear_loop_state(action_1)
         
         self.report({'INFO'}, f"Animations {self.start_enum} and {self.end_enum} stitched together")
 
@@ -414,10 +426,303 @@ class ChangeRootBoneOperator(bpy.types.Operator):
         if self.z:
             root_fcurves_location[2].data_path = f'pose.bones["{self.new_root_enum}"].location'
 
+        mark_action_changed(action)
+
         self.report({'INFO'}, f"Changed root bone from {self.action_enum} to {self.new_root_enum}")
 
         return {'FINISHED'}
 
+class LoopQualityReportOperator(bpy.types.Operator):
+    bl_idname = "object.loop_quality_report_operator"
+    bl_label = "Loop Quality Report"
+    bl_description = "Measure the discontinuity at the loop seam of every bone and flag outliers"
+
+    action_enum: bpy.props.EnumProperty(
+        name="Select Animation",
+        description="Choose an animation to analyze",
+        items=lambda self, context: get_actions_enum(context)
+    )
+
+    batch: bpy.props.BoolProperty(
+        name="All Animations",
+        description="Analyze every animation and write the results to a report file",
+        default=False
+    )
+
+    filepath: bpy.props.StringProperty(
+        name="Report File",
+        description="Where to write the batch report, the extension follows the report format",
+        default="//loop_quality",
+        subtype='FILE_PATH'
+    )
+
+    report_format: bpy.props.EnumProperty(
+        name="Report Format",
+        description="File format of the batch report",
+        items=[('CSV', "CSV", ""), ('JSON', "JSON", "")],
+        default='CSV'
+    )
+
+    outlier_threshold: bpy.props.FloatProperty(
+        name="Outlier Threshold",
+        description="Robust z-score above which a bone is flagged",
+        default=3.5,
+        min=0.0
+    )
+
+    root_enum: bpy.props.EnumProperty(
+        name="Select Root",
+        description="Choose the root bone",
+        items=lambda self, context: get_bones_enum(context)
+    )
+
+    loop_root_x: bpy.props.BoolProperty(name="Loop Root X", default=False)
+    loop_root_y: bpy.props.BoolProperty(name="Loop Root Y", default=True)
+    loop_root_z: bpy.props.BoolProperty(name="Loop Root Z", default=False)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.object
+
+        if obj is None or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+
+        dt = context.scene.render.fps_base / context.scene.render.fps
+        bone_names = [bone.name for bone in obj.pose.bones]
+        loop_root_axes = [self.loop_root_x, self.loop_root_y, self.loop_root_z]
+
+        if not self.batch:
+            if self.action_enum == 'NONE':
+                self.report({'ERROR'}, "No animation selected")
+                return {'CANCELLED'}
+
+            rows = analyze_loop_quality(bpy.data.actions.get(self.action_enum), bone_names, dt, self.outlier_threshold, self.root_enum, loop_root_axes)
+            if not rows:
+                self.report({'ERROR'}, f"Animation {self.action_enum} has too few frames or no keys for this armature")
+                return {'CANCELLED'}
+
+            worst = max(rows, key=lambda row: row["velocity"])
+            self.report({'INFO'}, f"Largest seam velocity jump on {worst['bone']}: {worst['velocity']:.4f}")
+            outliers = [row["bone"] for row in rows if row["outlier"]]
+            if outliers:
+                self.report({'WARNING'}, f"Outlier bones: {', '.join(outliers)}")
+            return {'FINISHED'}
+
+        if not self.filepath:
+            self.report({'ERROR'}, "No report file selected")
+            return {'CANCELLED'}
+
+        rows = []
+        for action in bpy.data.actions:
+            rows.extend(analyze_loop_quality(action, bone_names, dt, self.outlier_threshold, self.root_enum, loop_root_axes))
+
+        if not rows:
+            self.report({'WARNING'}, "No animations with keys for this armature found")
+            return {'CANCELLED'}
+
+        filepath = os.path.splitext(bpy.path.abspath(self.filepath))[0] + "." + self.report_format.lower()
+        write_loop_quality_report(rows, filepath, self.report_format)
+
+        num_outliers = sum(1 for row in rows if row["outlier"])
+        self.report({'INFO'}, f"Wrote loop quality report to {filepath} ({num_outliers} outlier bones)")
+
+        return {'FINISHED'}
+
+class ExportLoopedClipsOperator(bpy.types.Operator):
+    bl_idname = "object.export_looped_clips_operator"
+    bl_label = "Export Looped Clips"
+    bl_description = "Export animations to a compact quantized binary format for runtime playback"
+
+    action_enum: bpy.props.EnumProperty(
+        name="Select Animation",
+        description="Choose an animation to export",
+        items=lambda self, context: get_actions_enum(context)
+    )
+
+    batch: bpy.props.BoolProperty(
+        name="All Animations",
+        description="Export every animation with keys for this armature",
+        default=False
+    )
+
+    directory: bpy.props.StringProperty(
+        name="Export Folder",
+        description="Folder to write the clip files to",
+        default="//",
+        subtype='DIR_PATH'
+    )
+
+    tolerance: bpy.props.FloatProperty(
+        name="Translation Tolerance",
+        description="Translations that move less than this distance are stored once instead of every frame",
+        default=1e-4,
+        min=0.0
+    )
+
+    angle_tolerance: bpy.props.FloatProperty(
+        name="Rotation Tolerance",
+        description="Rotations that turn less than this angle are stored once instead of every frame",
+        default=1e-4,
+        min=0.0,
+        subtype='ANGLE'
+    )
+
+    verify: bpy.props.BoolProperty(
+        name="Verify",
+        description="Read every file back and report the largest quantization error",
+        default=True
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.object
+
+        if obj is None or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+
+        if not self.batch and self.action_enum == 'NONE':
+            self.report({'ERROR'}, "No animation selected")
+            return {'CANCELLED'}
+
+        directory = bpy.path.abspath(self.directory)
+        if not os.path.isdir(directory):
+            self.report({'ERROR'}, f"Export folder {directory} does not exist")
+            return {'CANCELLED'}
+
+        fps = context.scene.render.fps / context.scene.render.fps_base
+        bone_names = [bone.name for bone in obj.pose.bones]
+        actions = list(bpy.data.actions) if self.batch else [bpy.data.actions.get(self.action_enum)]
+
+        exported = 0
+        max_pos_error = 0.0
+        max_rot_error = 0.0
+        file_names = set()
+        renamed = []
+
+        for action in actions:
+            arrays = get_action_bone_arrays(action, bone_names)
+            if arrays is None:
+                continue
+
+            # different action names can clean to the same file name, number them instead of overwriting
+            file_name = bpy.path.clean_name(action.name)
+            unique_name = file_name
+            suffix = 2
+            while unique_name.lower() in file_names:
+                unique_name = f"{file_name}_{suffix}"
+                suffix += 1
+            file_names.add(unique_name.lower())
+            if unique_name != file_name:
+                renamed.append(f"{action.name} -> {unique_name}{CLIP_EXTENSION}")
+
+            filepath = os.path.join(directory, unique_name + CLIP_EXTENSION)
+            # loop_animation marks the actions it has looped, the runtime uses this to wrap playback
+            loops = "loop_offsets" in action
+            write_clip_file(filepath, bone_names, arrays[0], arrays[1], fps, loops, self.tolerance, self.angle_tolerance)
+            exported += 1
+
+            if self.verify:
+                pos_error, rot_error = compute_clip_round_trip_error(filepath, arrays[0], arrays[1])
+                max_pos_error = max(max_pos_error, pos_error)
+                max_rot_error = max(max_rot_error, rot_error)
+
+        if exported == 0:
+            self.report({'WARNING'}, "No animations with keys for this armature found")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Exported {exported} clips to {directory}")
+        if renamed:
+            self.report({'WARNING'}, f"File names already taken, exported as: {', '.join(renamed)}")
+        if self.verify:
+            self.report({'INFO'}, f"Largest round trip error: position {max_pos_error:.6f}, rotation {max_rot_error:.6f} rad")
+
+        return {'FINISHED'}
+
+class FindTransitionOperator(bpy.types.Operator):
+    bl_idname = "object.find_transition_operator"
+    bl_label = "Find Transition"
+    bl_description = "Find the frames where one animation can best cut into another"
+
+    start_enum: bpy.props.EnumProperty(
+        name="Start Animation",
+        description="Choose the first animation",
+        items=lambda self, context: get_actions_enum(context)
+    )
+
+    end_enum: bpy.props.EnumProperty(
+        name="End Animation",
+        description="Choose the second animation",
+        items=lambda self, context: get_actions_enum(context)
+    )
+
+    root_enum: bpy.props.EnumProperty(
+        name="Select Root",
+        description="Choose the root bone",
+        items=lambda self, context: get_bones_enum(context)
+    )
+
+    min_frames: bpy.props.IntProperty(
+        name="Minimum Frames",
+        description="Keep at least this many frames of each animation",
+        default=10,
+        min=1
+    )
+
+    trim: bpy.props.BoolProperty(
+        name="Trim Animations",
+        description="Cut both animations at the best transition so they can be stitched right away",
+        default=False
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.object
+
+        if obj is None or obj.type != 'ARMATURE':
+            self.report({'WARNING'}, "No armature selected")
+            return {'CANCELLED'}
+
+        if self.start_enum == 'NONE' or self.end_enum == 'NONE':
+            self.report({'WARNING'}, "No animations selected")
+            return {'CANCELLED'}
+
+        if self.start_enum == self.end_enum:
+            self.report({'WARNING'}, "Start and end animations must be different")
+            return {'CANCELLED'}
+
+        dt = context.scene.render.fps_base / context.scene.render.fps
+        index, signatures = get_transition_index(obj, self.root_enum, dt)
+
+        # the whole library is indexed so the normalization doesn't depend on what was queried before,
+        # actions without keys for this armature are left out and only changed actions are read again
+        update_transition_index(index, bpy.data.actions, signatures)
+
+        start_action = bpy.data.actions.get(self.start_enum)
+        end_action = bpy.data.actions.get(self.end_enum)
+
+        transitions = index.find_transitions(self.start_enum, self.end_enum, 1, self.min_frames)
+        if not transitions:
+            self.report({'ERROR'}, "No transition found, the animations have no keys for this armature or are too short")
+            return {'CANCELLED'}
+
+        start_frame, end_frame, cost = transitions[0]
+        self.report({'INFO'}, f"Best transition: {self.start_enum} frame {start_frame} to {self.end_enum} frame {end_frame} (cost {cost:.4f})")
+
+        if self.trim:
+            trim_action(start_action, int(start_action.frame_range[0]), start_frame)
+            trim_action(end_action, end_frame, int(end_action.frame_range[1]))
+            self.report({'INFO'}, f"Trimmed {self.start_enum} and {self.end_enum} to the transition")
+
+        return {'FINISHED'}
+
 
 # ==================== Helper functions ====================
 
@@ -481,6 +786,9 @@ def loop_animation(obj, ratio, dt, op):
     apply_positional_offsets(looped_bone_positions, raw_bone_positions, offset_bone_positions)
     apply_rotational_offsets(looped_bone_rotations, raw_bone_rotations, offset_bone_rotations)
 
+    # Remember how far each bone was pulled so the quality report can flag it later
+    store_loop_offsets(action, bones, offset_bone_positions, offset_bone_rotations, op.root_enum, op.loop_root_x, op.loop_root_y, op.loop_root_z)
+
     # Write the looped animation back to Blender
     write_to_animation(obj, looped_bone_positions, looped_bone_rotations, num_frames, op.root_enum, op.loop_root_x, op.loop_root_y, op.loop_root_z)
 
@@ -599,6 +907,7 @@ def write_to_animation(obj, positions, rotations, num_frames, root, alter_pos_x,
                 if fcurve is not None:
                     fcurve.update()
 
+    mark_action_changed(action)
     bpy.context.view_layer.update()
 
 def lerp(a: float, b: float, t: float) -> float:
@@ -609,6 +918,7 @@ def snap_keys_to_frames(action):
         for keyframe in fcurve.keyframe_points:
             keyframe.co[0] = round(keyframe.co[0])
         fcurve.update()
+    mark_action_changed(action)
 
 def center_animation_root(obj, root, center_x, center_y, center_z):
     action = obj.animation_data.action
@@ -639,6 +949,7 @@ def center_animation_root(obj, root, center_x, center_y, center_z):
     for fcurve in fcurves_location:
         fcurve.update()
     
+    mark_action_changed(action)
     bpy.context.view_layer.update()
 
 def offset_root(obj, root, offset_x, offset_y, offset_z):
@@ -662,3 +973,196 @@ def offset_root(obj, root, offset_x, offset_y, offset_z):
     
     bpy.context.view_layer.update()
 
+
+# ==================== Loop quality ====================
+
+def get_action_bone_arrays(action, bone_names):
+    # evaluates the fcurves directly so actions don't have to be assigned to the armature and played through,
+    # fcurve.evaluate follows the handles and interpolation mode of every key just like playback does
+    # returns positions (frames, bones, 3) and rotations (frames, bones, 4) or None if no bone is keyed
+    start = int(action.frame_range[0])
+    num_frames = int(action.frame_range[1] - action.frame_range[0])+1
+    frames = range(start, start + num_frames)
+
+    positions = np.zeros((num_frames, len(bone_names), 3))
+    rotations = np.zeros((num_frames, len(bone_names), 4))
+    rotations[..., 0] = 1.0
+
+    targets = {}
+    for bone_idx, bone_name in enumerate(bone_names):
+        targets[f'pose.bones["{bone_name}"].location'] = (positions, bone_idx)
+        targets[f'pose.bones["{bone_name}"].rotation_quaternion'] = (rotations, bone_idx)
+
+    keyed = False
+    for fcurve in action.fcurves:
+        target = targets.get(fcurve.data_path)
+        if target is None or len(fcurve.keyframe_points) == 0:
+            continue
+
+        array, bone_idx = target
+        array[:, bone_idx, fcurve.array_index] = [fcurve.evaluate(frame) for frame in frames]
+        keyed = True
+
+    if not keyed:
+        return None
+
+    rotations /= np.linalg.norm(rotations, axis=-1, keepdims=True)
+    return positions, rotations
+
+def get_keyed_bones(action, bone_names):
+    # which bones have location and which have rotation keys in the action
+    location_keyed = np.array([f'pose.bones["{bone_name}"].location' for bone_name in bone_names])
+    rotation_keyed = np.array([f'pose.bones["{bone_name}"].rotation_quaternion' for bone_name in bone_names])
+    keyed_paths = {fcurve.data_path for fcurve in action.fcurves if len(fcurve.keyframe_points) > 0}
+    return np.isin(location_keyed, list(keyed_paths)), np.isin(rotation_keyed, list(keyed_paths))
+
+def store_loop_offsets(action, bones, offset_positions, offset_rotations, root, alter_pos_x, alter_pos_y, alter_pos_z):
+    offset_positions = np.array([[tuple(offset) for offset in frame] for frame in offset_positions])
+    # write_to_animation leaves these root axes alone, so their offsets were never applied
+    for j, bone in enumerate(bones):
+        if bone.name == root:
+            offset_positions[:, j] *= [alter_pos_x, alter_pos_y, alter_pos_z]
+
+    pos = np.linalg.norm(offset_positions, axis=-1).max(axis=0)
+    rot = np.linalg.norm(np.array([[tuple(offset) for offset in frame] for frame in offset_rotations]), axis=-1).max(axis=0)
+    action["loop_offsets"] = {bone.name: [float(pos[j]), float(rot[j])] for j, bone in enumerate(bones)}
+
+def clear_loop_state(action):
+    # every operator that rewrites a looped action calls this, the exporter sets the loop flag from loop_offsets
+    if "loop_offsets" in action:
+        del action["loop_offsets"]
+
+def get_loop_offsets(action, bone_names):
+    # offsets are only known for actions that went through loop_animation, nan otherwise
+    stored = action.get("loop_offsets", {})
+    offsets = np.full((len(bone_names), 2), np.nan)
+    for j, bone_name in enumerate(bone_names):
+        if bone_name in stored:
+            offsets[j] = tuple(stored[bone_name])
+    return offsets[:, 0], offsets[:, 1]
+
+def analyze_loop_quality(action, bone_names, dt, threshold, root, loop_root_axes):
+    arrays = get_action_bone_arrays(action, bone_names)
+    if arrays is None or len(arrays[0]) < 3:
+        return []
+
+    # root axes that aren't looped are meant to drift away from the start, but their speed should still match at the seam
+    position_axes = np.ones((len(bone_names), 3))
+    if root in bone_names:
+        position_axes[bone_names.index(root)] = loop_root_axes
+
+    metrics = compute_seam_metrics(arrays[0], arrays[1], dt, position_axes)
+    metrics["max_position_offset"], metrics["max_rotation_offset"] = get_loop_offsets(action, bone_names)
+
+    location_keyed, rotation_keyed = get_keyed_bones(action, bone_names)
+    flags = flag_seam_outliers(metrics, location_keyed, rotation_keyed, threshold)
+
+    rows = []
+    for j, bone_name in enumerate(bone_names):
+        row = {"action": action.name, "bone": bone_name}
+        row.update({name: float(values[j]) for name, values in metrics.items()})
+        row["flagged"] = " ".join(name for name in metrics if flags[name][j])
+        row["outlier"] = bool(row["flagged"])
+        rows.append(row)
+    return rows
+
+def write_loop_quality_report(rows, filepath, report_format):
+    # worst bones first, so the top of the file is what needs looking at
+    rows = sorted(rows, key=lambda row: (-len(row["flagged"].split()), -row["velocity"]))
+
+    if report_format == 'JSON':
+        with open(filepath, "w") as f:
+            # json has no nan, unknown offsets become null
+            rows = [{key: (None if isinstance(value, float) and np.isnan(value) else value) for key, value in row.items()} for row in rows]
+            json.dump(rows, f, indent=2)
+        return
+
+    with open(filepath, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# ==================== Transition index ====================
+
+transition_indices = {}
+transition_signatures = {}
+
+# bumped whenever an action's keys are edited, by the operators here and by the depsgraph handler for edits in the UI
+action_versions = {}
+
+def mark_action_changed(action):
+    action_versions[action.name] = action_versions.get(action.name, 0) + 1
+
+@bpy.app.handlers.persistent
+def mark_changed_actions(scene, depsgraph):
+    for update in depsgraph.updates:
+        changed = update.id.original
+        if isinstance(changed, bpy.types.Object) and changed.animation_data is not None:
+            changed = changed.animation_data.action
+        if isinstance(changed, bpy.types.Action):
+            mark_action_changed(changed)
+
+def get_action_signature(action):
+    # cheap enough to check every action on every query, the keys are only read again when this changes
+    return (action_versions.get(action.name, 0), tuple(action.frame_range), len(action.fcurves))
+
+def update_transition_index(index, actions, signatures):
+    # signatures remembers every action that was looked at, including ones without keys for this rig
+    names = set()
+    for action in actions:
+        names.add(action.name)
+        signature = get_action_signature(action)
+        if signatures.get(action.name) == signature:
+            continue
+        signatures[action.name] = signature
+
+        arrays = get_action_bone_arrays(action, index.bone_names)
+        if arrays is None or len(arrays[0]) < 2:
+            index.remove_clip(action.name)
+        else:
+            index.set_clip(action.name, int(action.frame_range[0]), arrays[0], arrays[1], signature)
+
+    for name in list(signatures):
+        if name not in names:
+            del signatures[name]
+            index.remove_clip(name)
+
+def get_transition_index(obj, root, dt):
+    bone_names = [bone.name for bone in obj.pose.bones]
+    index = transition_indices.get(obj.name)
+    if index is None or index.bone_names != bone_names or index.root != root or index.dt != dt:
+        index = TransitionIndex(bone_names, root, dt)
+        transition_indices[obj.name] = index
+        transition_signatures[obj.name] = {}
+    return index, transition_signatures[obj.name]
+
+def trim_action(action, first, last):
+    # removes the keys outside first..last and moves the rest so the action starts at frame 0
+    for fcurve in action.fcurves:
+        # key the cut frames first, otherwise a cut between keys would no longer start or end on the matched pose
+        first_value = fcurve.evaluate(first)
+        last_value = fcurve.evaluate(last)
+        fcurve.keyframe_points.insert(first, first_value, options={'FAST'})
+        fcurve.keyframe_points.insert(last, last_value, options={'FAST'})
+
+        for keyframe in reversed(list(fcurve.keyframe_points)):
+            if keyframe.co[0] < first or keyframe.co[0] > last:
+                fcurve.keyframe_points.remove(keyframe, fast=True)
+
+        for keyframe in fcurve.keyframe_points:
+            keyframe.co[0] -= first
+            keyframe.handle_left[0] -= first
+            keyframe.handle_right[0] -= first
+        fcurve.update()
+
+    # a manual frame range would still cover the old frames
+    if action.use_frame_range:
+        action.frame_start = 0
+        action.frame_end = last - first
+
+    # the trimmed action no longer loops
+    clear_loop_state(action)
+
+    mark_action_changed(action)
+    bpy.context.view_layer.update()
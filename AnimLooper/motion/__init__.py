@@ -0,0 +1,2 @@
+# Pose math, loop analysis and the clip file format. Nothing in here imports bpy,
+# so it can be used and tested outside of Blender.
@@ -0,0 +1,190 @@
+import numpy as np
+from .quaternions import *
+
+# ==================== Clip format ====================
+
+# File layout, all little endian and every section 8 byte aligned so the file can be memory mapped:
+#   header
+#   bone table, one record per bone
+#   rotation track, frames x animated rotation bones x 3 uint16 (smallest three)
+#   translation track, frames x animated translation bones x 3 uint16 (range quantized)
+# Bones whose rotation or translation doesn't change are flagged constant and left out of the tracks.
+# Clips with CLIP_FLAG_LOOPS are written without their last frame, which loop_animation makes a copy of the first one.
+# Playback wraps from the last stored frame to the first, moving each bone by its loop_delta every cycle. loop_delta is
+# zero except on root axes that weren't looped, where it carries the root motion of one cycle.
+
+CLIP_MAGIC = b"ALCP"
+CLIP_VERSION = 2
+CLIP_EXTENSION = ".alc"
+
+CLIP_FLAG_LOOPS = 1
+
+BONE_CONSTANT_ROTATION = 1
+BONE_CONSTANT_TRANSLATION = 2
+
+CLIP_HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("flags", "<u2"),
+    ("num_frames", "<u4"),
+    ("num_bones", "<u4"),
+    ("fps", "<f4"),
+    ("num_rotation_tracks", "<u4"),
+    ("num_translation_tracks", "<u4"),
+    ("rotation_offset", "<u4"),
+    ("translation_offset", "<u4"),
+    ("reserved", "<u4"),
+])
+
+CLIP_BONE = np.dtype([
+    ("name", "S64"),
+    ("flags", "<u4"),
+    ("translation_min", "<f4", 3),
+    ("translation_extent", "<f4", 3),
+    ("rotation", "<f4", 4),
+    ("loop_delta", "<f4", 3),
+])
+
+SMALLEST_THREE_RANGE = 1.0 / np.sqrt(2.0)
+SMALLEST_THREE_MAX = 0x7FFF
+TRANSLATION_MAX = 0xFFFF
+
+def align8(offset):
+    return (offset + 7) & ~7
+
+def quantize_quats_smallest_three(q):
+    # drops the largest component and stores the other three in 15 bits each,
+    # the 2 bit index of the dropped component goes in the top bits of the first two values
+    largest = np.argmax(np.abs(q), axis=-1)
+    q = np.where(np.take_along_axis(q, largest[..., None], axis=-1) < 0.0, -q, q)
+
+    rest = q[np.arange(4) != largest[..., None]].reshape(q.shape[:-1] + (3,))
+    quantized = np.round((rest / SMALLEST_THREE_RANGE + 1.0) * 0.5 * SMALLEST_THREE_MAX)
+    quantized = np.clip(quantized, 0, SMALLEST_THREE_MAX).astype(np.uint16)
+
+    quantized[..., 0] |= ((largest >> 1) & 1).astype(np.uint16) << 15
+    quantized[..., 1] |= (largest & 1).astype(np.uint16) << 15
+    return quantized
+
+def dequantize_quats_smallest_three(quantized):
+    quantized = np.asarray(quantized, dtype=np.uint16)
+    largest = ((quantized[..., 0] >> 15) << 1) | (quantized[..., 1] >> 15)
+
+    rest = ((quantized & SMALLEST_THREE_MAX).astype(np.float32) / SMALLEST_THREE_MAX * 2.0 - 1.0) * SMALLEST_THREE_RANGE
+    dropped = np.sqrt(np.maximum(0.0, 1.0 - np.sum(rest * rest, axis=-1)))
+
+    mask = np.arange(4) != largest[..., None]
+    q = np.empty(quantized.shape[:-1] + (4,), dtype=np.float32)
+    q[mask] = rest.reshape(-1)
+    q[~mask] = dropped.reshape(-1)
+    return q
+
+def write_clip_file(filepath, bone_names, positions, rotations, fps, loops, tolerance, angle_tolerance):
+    # positions and rotations are every frame of the action, for looping clips including the copy of the first at the end
+    bones = np.zeros(positions.shape[1], dtype=CLIP_BONE)
+    bones["name"] = [name.encode("utf-8")[:63] for name in bone_names]
+
+    if loops and len(positions) > 1:
+        bones["loop_delta"] = positions[-1] - positions[0]
+        positions, rotations = positions[:-1], rotations[:-1]
+
+    num_frames, num_bones = positions.shape[:2]
+
+    # a rotation is constant if every frame is within angle_tolerance radians of the first one
+    angles = np.linalg.norm(quat_to_scaled_angle_axis_np(quat_mul_np(quat_inv_np(rotations[:1]), rotations)), axis=-1)
+    constant_rotation = np.all(angles <= angle_tolerance, axis=0)
+    translation_min = positions.min(axis=0)
+    translation_extent = positions.max(axis=0) - translation_min
+    constant_translation = np.all(translation_extent <= tolerance, axis=-1)
+
+    bones["flags"] = np.where(constant_rotation, BONE_CONSTANT_ROTATION, 0) | np.where(constant_translation, BONE_CONSTANT_TRANSLATION, 0)
+    bones["rotation"] = rotations[0]
+    bones["translation_min"] = np.where(constant_translation[:, None], positions[0], translation_min)
+    bones["translation_extent"] = np.where(constant_translation[:, None], 0.0, translation_extent)
+
+    rotation_track = quantize_quats_smallest_three(rotations[:, ~constant_rotation])
+
+    animated = positions[:, ~constant_translation]
+    extent = translation_extent[~constant_translation]
+    scale = np.divide(TRANSLATION_MAX, extent, out=np.zeros_like(extent), where=extent > 0.0)
+    translation_track = np.round((animated - translation_min[~constant_translation]) * scale).astype("<u2")
+
+    rotation_offset = align8(CLIP_HEADER.itemsize + bones.nbytes)
+    translation_offset = align8(rotation_offset + rotation_track.nbytes)
+
+    header = np.zeros(1, dtype=CLIP_HEADER)
+    header["magic"] = CLIP_MAGIC
+    header["version"] = CLIP_VERSION
+    header["flags"] = CLIP_FLAG_LOOPS if loops else 0
+    header["num_frames"] = num_frames
+    header["num_bones"] = num_bones
+    header["fps"] = fps
+    header["num_rotation_tracks"] = rotation_track.shape[1]
+    header["num_translation_tracks"] = translation_track.shape[1]
+    header["rotation_offset"] = rotation_offset
+    header["translation_offset"] = translation_offset
+
+    with open(filepath, "wb") as f:
+        f.write(header.tobytes())
+        f.write(bones.tobytes())
+        f.write(b"\0" * (rotation_offset - f.tell()))
+        f.write(rotation_track.astype("<u2").tobytes())
+        f.write(b"\0" * (translation_offset - f.tell()))
+        f.write(translation_track.tobytes())
+
+def read_clip_file(filepath):
+    # the tracks are views into the memory mapped file, nothing is decoded until it's used
+    data = np.memmap(filepath, dtype=np.uint8, mode="r")
+
+    header = data[:CLIP_HEADER.itemsize].view(CLIP_HEADER)[0]
+    if header["magic"] != CLIP_MAGIC or header["version"] != CLIP_VERSION:
+        raise ValueError(f"{filepath} is not a version {CLIP_VERSION} animation looper clip")
+
+    num_frames = int(header["num_frames"])
+    num_bones = int(header["num_bones"])
+    num_rotations = int(header["num_rotation_tracks"])
+    num_translations = int(header["num_translation_tracks"])
+    rotation_offset = int(header["rotation_offset"])
+    translation_offset = int(header["translation_offset"])
+
+    bones = data[CLIP_HEADER.itemsize:CLIP_HEADER.itemsize + num_bones * CLIP_BONE.itemsize].view(CLIP_BONE)
+    rotation_track = data[rotation_offset:rotation_offset + num_frames * num_rotations * 6].view("<u2").reshape(num_frames, num_rotations, 3)
+    translation_track = data[translation_offset:translation_offset + num_frames * num_translations * 6].view("<u2").reshape(num_frames, num_translations, 3)
+
+    return {
+        "loops": bool(header["flags"] & CLIP_FLAG_LOOPS),
+        "fps": float(header["fps"]),
+        "bones": bones,
+        "rotation_track": rotation_track,
+        "translation_track": translation_track,
+    }
+
+def decode_clip(clip):
+    bones = clip["bones"]
+    num_frames = len(clip["rotation_track"])
+
+    rotations = np.broadcast_to(bones["rotation"], (num_frames,) + bones["rotation"].shape).copy()
+    animated_rotation = (bones["flags"] & BONE_CONSTANT_ROTATION) == 0
+    rotations[:, animated_rotation] = dequantize_quats_smallest_three(clip["rotation_track"])
+
+    positions = np.broadcast_to(bones["translation_min"], (num_frames,) + bones["translation_min"].shape).copy()
+    animated_translation = (bones["flags"] & BONE_CONSTANT_TRANSLATION) == 0
+    extent = bones["translation_extent"][animated_translation]
+    positions[:, animated_translation] += clip["translation_track"].astype(np.float32) / TRANSLATION_MAX * extent
+
+    return positions, rotations
+
+def compute_clip_round_trip_error(filepath, positions, rotations):
+    # largest position distance and rotation angle between the poses given to write_clip_file and what the runtime will see
+    clip = read_clip_file(filepath)
+    decoded_positions, decoded_rotations = decode_clip(clip)
+
+    if clip["loops"] and len(decoded_positions) < len(positions):
+        # the dropped last frame is where the next cycle starts
+        decoded_positions = np.concatenate([decoded_positions, decoded_positions[:1] + clip["bones"]["loop_delta"]])
+        decoded_rotations = np.concatenate([decoded_rotations, decoded_rotations[:1]])
+
+    pos_error = np.linalg.norm(decoded_positions - positions, axis=-1).max(initial=0.0)
+    rot_difference = quat_mul_np(quat_inv_np(rotations), decoded_rotations.astype(np.float64))
+    rot_error = np.linalg.norm(quat_to_scaled_angle_axis_np(rot_difference), axis=-1).max(initial=0.0)
+    return float(pos_error), float(rot_error)
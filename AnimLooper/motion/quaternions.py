@@ -0,0 +1,32 @@
+import numpy as np
+
+# Quaternions are (w, x, y, z) like mathutils, in arrays of any shape with the components last.
+
+def quat_mul_np(a, b):
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw*bw - ax*bx - ay*by - az*bz,
+        aw*bx + ax*bw + ay*bz - az*by,
+        aw*by - ax*bz + ay*bw + az*bx,
+        aw*bz + ax*by - ay*bx + az*bw,
+    ], axis=-1)
+
+def quat_inv_np(q):
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+def quat_to_scaled_angle_axis_np(q):
+    # takes the shortest path, so q and -q give the same result
+    q = np.where(q[..., :1] < 0.0, -q, q)
+    length = np.linalg.norm(q[..., 1:], axis=-1, keepdims=True)
+    angle = 2.0 * np.arctan2(length, q[..., :1])
+    scale = np.where(length > 1e-8, angle / np.maximum(length, 1e-8), 2.0)
+    return q[..., 1:] * scale
+
+def quat_to_two_axis(q):
+    # first two columns of the rotation matrix, unlike the quaternion itself this has no sign flips
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    return np.stack([
+        1.0 - 2.0*(y*y + z*z), 2.0*(x*y + w*z), 2.0*(x*z - w*y),
+        2.0*(x*y - w*z), 1.0 - 2.0*(x*x + z*z), 2.0*(y*z + w*x),
+    ], axis=-1)
@@ -0,0 +1,50 @@
+import numpy as np
+from .quaternions import *
+
+LOCATION_METRICS = ["position", "velocity", "acceleration", "max_position_offset"]
+ROTATION_METRICS = ["rotation", "angular_velocity", "angular_acceleration", "max_rotation_offset"]
+
+def compute_seam_metrics(positions, rotations, dt, position_axes=None):
+    # compares how the clip leaves its last frame with how it enters its first one, per bone
+    # position_axes (bones, 3) masks axes out of the position jump only, velocity and acceleration always use all axes
+    seam_position = positions[0] - positions[-1]
+    if position_axes is not None:
+        seam_position = seam_position * position_axes
+
+    velocities = np.diff(positions, axis=0) / dt
+    accelerations = np.diff(velocities, axis=0) / dt
+    angular_velocities = quat_to_scaled_angle_axis_np(quat_mul_np(quat_inv_np(rotations[:-1]), rotations[1:])) / dt
+    angular_accelerations = np.diff(angular_velocities, axis=0) / dt
+
+    seam_rotation = quat_to_scaled_angle_axis_np(quat_mul_np(quat_inv_np(rotations[-1]), rotations[0]))
+
+    return {
+        "position": np.linalg.norm(seam_position, axis=-1),
+        "rotation": np.linalg.norm(seam_rotation, axis=-1),
+        "velocity": np.linalg.norm(velocities[0] - velocities[-1], axis=-1),
+        "angular_velocity": np.linalg.norm(angular_velocities[0] - angular_velocities[-1], axis=-1),
+        "acceleration": np.linalg.norm(accelerations[0] - accelerations[-1], axis=-1),
+        "angular_acceleration": np.linalg.norm(angular_accelerations[0] - angular_accelerations[-1], axis=-1),
+    }
+
+def flag_outliers(values, threshold, scored, tolerance=1e-4):
+    # robust z-score, so one broken bone can't hide itself by inflating the spread
+    # only the scored bones are compared, unkeyed channels would pull the median to 0
+    flags = np.zeros(len(values), dtype=bool)
+    if not scored.any():
+        return flags
+
+    values = np.nan_to_num(values[scored])
+    median = np.median(values)
+    spread = np.median(np.abs(values - median)) * 1.4826
+    scores = (values - median) / max(spread, tolerance)
+    flags[scored] = (scores > threshold) & (values > tolerance)
+    return flags
+
+def flag_seam_outliers(metrics, location_keyed, rotation_keyed, threshold):
+    # location metrics are only compared between bones with location keys, rotation metrics between bones with rotation keys
+    flags = {}
+    for name, values in metrics.items():
+        scored = location_keyed if name in LOCATION_METRICS else rotation_keyed
+        flags[name] = flag_outliers(values, threshold, scored)
+    return flags
@@ -0,0 +1,110 @@
+import numpy as np
+from .quaternions import *
+
+# Feature groups are normalized separately so every group has the same say in the distance,
+# no matter how many bones or what units it has.
+TRANSITION_FEATURE_GROUPS = ["position", "rotation", "velocity", "angular_velocity"]
+
+def central_differences(diffs):
+    # turns the differences between consecutive frames into one value per frame
+    values = np.empty((len(diffs) + 1,) + diffs.shape[1:])
+    values[0] = diffs[0]
+    values[-1] = diffs[-1]
+    values[1:-1] = (diffs[:-1] + diffs[1:]) * 0.5
+    return values
+
+def compute_transition_features(positions, rotations, root_idx, dt):
+    # the root position depends on where the clip was recorded, only its velocity is compared
+    num_frames = len(positions)
+    local_positions = np.delete(positions, root_idx, axis=1) if root_idx is not None else positions
+
+    velocities = central_differences(np.diff(positions, axis=0) / dt)
+    angular_velocities = central_differences(quat_to_scaled_angle_axis_np(quat_mul_np(quat_inv_np(rotations[:-1]), rotations[1:])) / dt)
+
+    return {
+        "position": local_positions.reshape(num_frames, -1),
+        "rotation": quat_to_two_axis(rotations).reshape(num_frames, -1),
+        "velocity": velocities.reshape(num_frames, -1),
+        "angular_velocity": angular_velocities.reshape(num_frames, -1),
+    }
+
+class TransitionIndex:
+    # Pose and velocity features for every frame of every clip of one rig.
+    # Features are kept per clip and only recomputed when it is set again, the normalization is
+    # rebuilt from per clip sums so adding or changing one clip doesn't touch the others.
+
+    def __init__(self, bone_names, root, dt):
+        self.bone_names = bone_names
+        self.root = root
+        self.root_idx = bone_names.index(root) if root in bone_names else None
+        self.dt = dt
+        self.entries = {}
+        self.weights = None
+
+    def set_clip(self, name, start, positions, rotations, signature=None):
+        # start is the frame number of the first pose, signature is whatever the caller uses to tell if the clip changed
+        features = compute_transition_features(positions, rotations, self.root_idx, self.dt)
+        self.entries[name] = {
+            "signature": signature,
+            "start": start,
+            "features": np.concatenate([features[group] for group in TRANSITION_FEATURE_GROUPS], axis=1),
+            "sizes": [features[group].shape[1] for group in TRANSITION_FEATURE_GROUPS],
+            "sum": np.concatenate([features[group].sum(axis=0) for group in TRANSITION_FEATURE_GROUPS]),
+            "sum_sq": np.concatenate([(features[group] ** 2).sum(axis=0) for group in TRANSITION_FEATURE_GROUPS]),
+        }
+        self.weights = None
+
+    def remove_clip(self, name):
+        if self.entries.pop(name, None) is not None:
+            self.weights = None
+
+    def clip_names(self):
+        return list(self.entries)
+
+    def get_signature(self, name):
+        entry = self.entries.get(name)
+        return entry["signature"] if entry is not None else None
+
+    def get_weights(self):
+        if self.weights is None:
+            entries = list(self.entries.values())
+            count = sum(len(entry["features"]) for entry in entries)
+            mean = sum(entry["sum"] for entry in entries) / count
+            std = np.sqrt(np.maximum(sum(entry["sum_sq"] for entry in entries) / count - mean * mean, 0.0))
+
+            weights = []
+            offset = 0
+            for size in entries[0]["sizes"]:
+                group_std = std[offset:offset + size].mean() if size > 0 else 0.0
+                weights.append(np.full(size, 1.0 / max(group_std, 1e-6)))
+                offset += size
+            self.weights = np.concatenate(weights)
+        return self.weights
+
+    def find_transitions(self, from_name, to_name, count=5, min_frames=1):
+        # best (from frame, to frame, cost) pairs for cutting from the first action into the second
+        if from_name not in self.entries or to_name not in self.entries:
+            return []
+
+        weights = self.get_weights()
+        from_entry = self.entries[from_name]
+        to_entry = self.entries[to_name]
+
+        # cutting after frame i keeps i+1 frames of the first action, cutting before frame j keeps len-j of the second
+        a = from_entry["features"][min_frames - 1:] * weights
+        b = to_entry["features"][:len(to_entry["features"]) - min_frames + 1] * weights
+        if len(a) == 0 or len(b) == 0:
+            return []
+
+        costs = np.sum(a * a, axis=1)[:, None] + np.sum(b * b, axis=1)[None, :] - 2.0 * (a @ b.T)
+        costs = np.maximum(costs, 0.0).ravel()
+
+        count = min(count, len(costs))
+        best = np.argpartition(costs, count - 1)[:count]
+        best = best[np.argsort(costs[best])]
+        from_frames, to_frames = np.unravel_index(best, (len(a), len(b)))
+
+        return [
+            (from_entry["start"] + min_frames - 1 + int(i), to_entry["start"] + int(j), float(costs[k]))
+            for i, j, k in zip(from_frames, to_frames, best)
+        ]
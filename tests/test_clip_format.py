@@ -0,0 +1,160 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the package __init__ needs bpy, the motion package only needs numpy
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AnimLooper"))
+
+from motion.clip_format import (
+    BONE_CONSTANT_ROTATION,
+    BONE_CONSTANT_TRANSLATION,
+    compute_clip_round_trip_error,
+    decode_clip,
+    dequantize_quats_smallest_three,
+    quantize_quats_smallest_three,
+    read_clip_file,
+    write_clip_file,
+)
+from motion.quaternions import quat_inv_np, quat_mul_np, quat_to_scaled_angle_axis_np
+
+# a 15 bit step is about 4.3e-5, the error of the three stored components also carries into the dropped one
+MAX_ROTATION_ERROR = 2e-4
+
+
+def random_quats(rng, shape):
+    q = rng.normal(size=shape + (4,))
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def axis_angle_quats(axis, angles):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    return np.concatenate([np.cos(angles / 2.0)[..., None], np.sin(angles / 2.0)[..., None] * axis], axis=-1)
+
+
+def write_and_check(path, positions, rotations, loops=False, fps=30.0):
+    names = [f"bone{j}" for j in range(positions.shape[1])]
+    write_clip_file(str(path), names, positions, rotations, fps, loops, 1e-4, 1e-4)
+    clip = read_clip_file(str(path))
+    assert clip["loops"] == loops
+    assert clip["fps"] == fps
+    assert [name.decode() for name in clip["bones"]["name"]] == names
+    return clip, compute_clip_round_trip_error(str(path), positions, rotations)
+
+
+def test_smallest_three_round_trip():
+    rng = np.random.default_rng(0)
+    q = random_quats(rng, (1000,))
+    decoded = dequantize_quats_smallest_three(quantize_quats_smallest_three(q))
+
+    angles = np.linalg.norm(quat_to_scaled_angle_axis_np(quat_mul_np(quat_inv_np(q), decoded.astype(np.float64))), axis=-1)
+    assert np.all(angles < MAX_ROTATION_ERROR)
+
+
+def test_smallest_three_hemisphere():
+    rng = np.random.default_rng(1)
+    q = random_quats(rng, (100,))
+    assert np.array_equal(quantize_quats_smallest_three(q), quantize_quats_smallest_three(-q))
+
+
+def test_random_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    positions = rng.normal(size=(60, 8, 3))
+    rotations = random_quats(rng, (60, 8))
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "random.alc", positions, rotations)
+
+    assert clip["rotation_track"].shape == (60, 8, 3)
+    assert clip["translation_track"].shape == (60, 8, 3)
+    assert pos_error < 1e-4 * np.ptp(positions, axis=0).max()
+    assert rot_error < MAX_ROTATION_ERROR
+
+
+def test_near_constant_rotation_is_animated(tmp_path):
+    angles = np.linspace(0.0, np.radians(1.5), 40)[:, None]
+    rotations = axis_angle_quats([0.0, 1.0, 0.0], angles)
+    positions = np.zeros((40, 1, 3))
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "near_constant.alc", positions, rotations)
+
+    assert clip["bones"]["flags"][0] & BONE_CONSTANT_ROTATION == 0
+    assert rot_error < MAX_ROTATION_ERROR
+
+
+def test_all_constant_bones(tmp_path):
+    rng = np.random.default_rng(3)
+    positions = np.broadcast_to(rng.normal(size=(1, 4, 3)), (20, 4, 3)).copy()
+    rotations = np.broadcast_to(random_quats(rng, (1, 4)), (20, 4, 4)).copy()
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "constant.alc", positions, rotations)
+
+    assert np.all(clip["bones"]["flags"] == BONE_CONSTANT_ROTATION | BONE_CONSTANT_TRANSLATION)
+    assert clip["rotation_track"].shape == (20, 0, 3)
+    assert clip["translation_track"].shape == (20, 0, 3)
+    assert pos_error < 1e-6
+    assert rot_error < 1e-6
+
+
+def test_hemisphere_flips_round_trip(tmp_path):
+    rng = np.random.default_rng(4)
+    rotations = random_quats(rng, (30, 3))
+    rotations[::2] *= -1.0
+    positions = np.zeros((30, 3, 3))
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "hemisphere.alc", positions, rotations)
+
+    assert rot_error < MAX_ROTATION_ERROR
+
+
+def test_constant_rotation_with_hemisphere_flips(tmp_path):
+    rotations = np.broadcast_to(axis_angle_quats([1.0, 0.0, 0.0], np.array(0.7)), (10, 1, 4)).copy()
+    rotations[1::2] *= -1.0
+    positions = np.zeros((10, 1, 3))
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "constant_flips.alc", positions, rotations)
+
+    assert clip["bones"]["flags"][0] & BONE_CONSTANT_ROTATION
+    assert rot_error < 1e-6
+
+
+def test_loop_flag_and_decode(tmp_path):
+    rng = np.random.default_rng(5)
+    positions = rng.normal(size=(12, 2, 3))
+    rotations = random_quats(rng, (12, 2))
+    positions[-1] = positions[0]
+    rotations[-1] = rotations[0]
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "loop.alc", positions, rotations, loops=True, fps=60.0)
+    decoded_positions, decoded_rotations = decode_clip(clip)
+
+    # the copy of the first frame at the end is not stored
+    assert decoded_positions.shape == (11, 2, 3)
+    assert decoded_rotations.shape == (11, 2, 4)
+    assert np.allclose(clip["bones"]["loop_delta"], 0.0)
+    assert rot_error < MAX_ROTATION_ERROR
+
+
+def test_loop_keeps_root_motion(tmp_path):
+    num_frames = 20
+    positions = np.zeros((num_frames, 2, 3))
+    # root moves forward on an axis that wasn't looped, bobs up and down on one that was
+    positions[:, 0, 0] = np.arange(num_frames) * 0.25
+    positions[:, 0, 2] = np.sin(np.linspace(0.0, 2.0 * np.pi, num_frames))
+    rotations = np.zeros((num_frames, 2, 4))
+    rotations[..., 0] = 1.0
+
+    clip, (pos_error, rot_error) = write_and_check(tmp_path / "root_motion.alc", positions, rotations, loops=True)
+
+    assert len(clip["translation_track"]) == num_frames - 1
+    assert np.allclose(clip["bones"]["loop_delta"][0], [0.25 * (num_frames - 1), 0.0, 0.0], atol=1e-6)
+    assert np.allclose(clip["bones"]["loop_delta"][1], 0.0)
+    assert pos_error < 1e-4 * positions.max()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.alc"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        read_clip_file(str(path))
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import numpy as np
+
+# the package __init__ needs bpy, the motion package only needs numpy
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AnimLooper"))
+
+from motion.seam import compute_seam_metrics, flag_outliers, flag_seam_outliers
+
+
+def identity_rotations(num_frames, num_bones):
+    rotations = np.zeros((num_frames, num_bones, 4))
+    rotations[..., 0] = 1.0
+    return rotations
+
+
+def spin_rotations(num_frames, turns=1.0):
+    # constant speed around z, a whole number of turns ends where it started
+    angles = np.linspace(0.0, 2.0 * np.pi * turns, num_frames)
+    rotations = np.zeros((num_frames, 4))
+    rotations[:, 0] = np.cos(angles / 2.0)
+    rotations[:, 3] = np.sin(angles / 2.0)
+    return rotations
+
+
+def test_perfect_loop_scores_zero():
+    num_frames = 30
+    positions = np.zeros((num_frames, 3, 3))
+    # root drifts forward at a constant speed on an unlooped axis
+    positions[:, 0, 0] = np.arange(num_frames) * 0.1
+    rotations = identity_rotations(num_frames, 3)
+    rotations[:, 1] = spin_rotations(num_frames)
+
+    position_axes = np.ones((3, 3))
+    position_axes[0] = [False, True, False]
+    metrics = compute_seam_metrics(positions, rotations, 1.0, position_axes)
+
+    for name, values in metrics.items():
+        assert np.allclose(values, 0.0, atol=1e-9), name
+
+
+def test_unlooped_root_axis_still_measures_velocity():
+    num_frames = 30
+    positions = np.zeros((num_frames, 1, 3))
+    steps = np.full(num_frames - 1, 0.1)
+    steps[-5:] = 0.02
+    positions[1:, 0, 0] = np.cumsum(steps)
+    rotations = identity_rotations(num_frames, 1)
+
+    metrics = compute_seam_metrics(positions, rotations, 1.0, np.array([[False, True, False]]))
+
+    assert metrics["position"][0] == 0.0
+    assert np.isclose(metrics["velocity"][0], 0.08)
+
+
+def test_velocity_jump_scales_with_dt():
+    positions = np.zeros((10, 1, 3))
+    positions[:, 0, 1] = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 7.5, 8.0]
+    rotations = identity_rotations(10, 1)
+
+    metrics = compute_seam_metrics(positions, rotations, 0.5)
+
+    assert np.isclose(metrics["velocity"][0], (1.0 - 0.5) / 0.5)
+
+
+def test_broken_bone_is_flagged():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0.01, 0.02, 12)
+    values[7] = 0.5
+
+    flags = flag_outliers(values, 3.5, np.ones(12, dtype=bool))
+
+    assert flags[7]
+    assert flags.sum() == 1
+
+
+def test_only_keyed_channels_are_scored():
+    # only the root has location keys, its drift has nothing to be compared against
+    metrics = {
+        "position": np.array([2.0, 0.0, 0.0, 0.0, 0.0]),
+        "velocity": np.array([0.3, 0.0, 0.0, 0.0, 0.0]),
+        "rotation": np.array([0.01, 0.012, 0.011, 0.4, 0.0]),
+    }
+    location_keyed = np.array([True, False, False, False, False])
+    rotation_keyed = np.array([True, True, True, True, False])
+
+    flags = flag_seam_outliers(metrics, location_keyed, rotation_keyed, 3.5)
+
+    assert not flags["position"].any()
+    assert not flags["velocity"].any()
+    assert flags["rotation"].tolist() == [False, False, False, True, False]
+
+
+def test_no_keyed_bones():
+    flags = flag_outliers(np.array([1.0, 2.0]), 3.5, np.zeros(2, dtype=bool))
+    assert not flags.any()
+
+
+def test_unknown_offsets_are_not_flagged():
+    values = np.array([np.nan, np.nan, np.nan, np.nan])
+    flags = flag_outliers(values, 3.5, np.ones(4, dtype=bool))
+    assert not flags.any()
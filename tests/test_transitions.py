@@ -0,0 +1,112 @@
+import os
+import sys
+
+import numpy as np
+
+# the package __init__ needs bpy, the motion package only needs numpy
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "AnimLooper"))
+
+from motion.transitions import TransitionIndex, central_differences
+
+BONE_NAMES = ["Hips", "Spine", "Head"]
+
+
+def random_clip(rng, num_frames):
+    positions = np.cumsum(rng.normal(scale=0.1, size=(num_frames, len(BONE_NAMES), 3)), axis=0)
+    rotations = rng.normal(size=(num_frames, len(BONE_NAMES), 4))
+    rotations /= np.linalg.norm(rotations, axis=-1, keepdims=True)
+    return positions, rotations
+
+
+def shared_run_clips():
+    # frames 11-13 of a are copied to frames 4-6 of b, only a 12 and b 5 have the same pose and velocity
+    rng = np.random.default_rng(0)
+    a = random_clip(rng, 30)
+    b = random_clip(rng, 30)
+    b[0][4:7] = a[0][11:14]
+    b[1][4:7] = a[1][11:14]
+    return a, b
+
+
+def make_index(clips, starts=None):
+    index = TransitionIndex(BONE_NAMES, "Hips", 1.0 / 30.0)
+    for name, (positions, rotations) in clips.items():
+        index.set_clip(name, (starts or {}).get(name, 0), positions, rotations)
+    return index
+
+
+def test_central_differences():
+    diffs = np.array([1.0, 3.0, 5.0])
+    assert central_differences(diffs).tolist() == [1.0, 2.0, 4.0, 5.0]
+
+
+def test_exact_match():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b})
+
+    from_frame, to_frame, cost = index.find_transitions("a", "b", 1)[0]
+
+    assert (from_frame, to_frame) == (12, 5)
+    assert cost < 1e-9
+
+
+def test_results_are_sorted():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b})
+
+    costs = [cost for _, _, cost in index.find_transitions("a", "b", 10)]
+
+    assert len(costs) == 10
+    assert costs == sorted(costs)
+
+
+def test_start_frame_is_added_back():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b}, starts={"a": 100, "b": 50})
+
+    from_frame, to_frame, cost = index.find_transitions("a", "b", 1)[0]
+
+    assert (from_frame, to_frame) == (112, 55)
+
+
+def test_min_frames_bounds():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b})
+
+    # at least 14 frames of each clip are kept: cut after frame 13 or later, before frame 16 or earlier
+    transitions = index.find_transitions("a", "b", 30 * 30, 14)
+    assert len(transitions) == 17 * 17
+    assert min(from_frame for from_frame, _, _ in transitions) == 13
+    assert max(to_frame for _, to_frame, _ in transitions) == 16
+
+    # keeping 26 frames of b rules out the exact match at b frame 5
+    from_frame, to_frame, cost = index.find_transitions("a", "b", 1, 26)[0]
+    assert to_frame <= 4
+    assert cost > 1e-6
+
+    assert index.find_transitions("a", "b", 1, 31) == []
+
+
+def test_unknown_clip():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b})
+    assert index.find_transitions("a", "missing", 1) == []
+
+
+def test_set_and_remove_clip_update_weights():
+    a, b = shared_run_clips()
+    index = make_index({"a": a, "b": b})
+    weights = index.get_weights().copy()
+
+    positions, rotations = random_clip(np.random.default_rng(1), 40)
+    index.set_clip("c", 0, positions * 10.0, rotations, "c1")
+    assert index.get_signature("c") == "c1"
+    assert sorted(index.clip_names()) == ["a", "b", "c"]
+    assert not np.allclose(index.get_weights(), weights)
+
+    index.remove_clip("c")
+    assert index.get_signature("c") is None
+    assert np.allclose(index.get_weights(), weights)
+
+    # the exact match doesn't depend on what else has been indexed
+    assert index.find_transitions("a", "b", 1)[0][:2] == (12, 5)